@@ -1,13 +1,15 @@
 # Donut Agent Configuration
 
-AGENT_NAME = "fetch-a-donut"
-COUPON_PREFIX = "DONUT"
+from typing import Final
+
+AGENT_NAME: Final = "fetch-a-donut"
+COUPON_PREFIX: Final = "DONUT"
 
 # Conference Settings
-CONFERENCE_ID = "TREEHACKS12"  # Change for different events
-CONFERENCE_NAME = "TreeHacks 12"
+CONFERENCE_ID: Final = "TREEHACKS12"  # Change for different events
+CONFERENCE_NAME: Final = "TreeHacks 12"
 
 # ASI:One LLM
-ASI_ONE_BASE_URL = "https://api.asi1.ai/v1"
-ASI_ONE_MODEL = "asi1"
-ASI_ONE_MAX_TOKENS = 256
+ASI_ONE_BASE_URL: Final = "https://api.asi1.ai/v1"
+ASI_ONE_MODEL: Final = "asi1"
+ASI_ONE_MAX_TOKENS: Final = 256